@@ -3,43 +3,97 @@ Flower Shop Catalog - Backend API (ĐÃ FIX HOÀN TOÀN)
 FastAPI + Supabase + Excel + PDF
 """
 
-from fastapi import FastAPI, UploadFile, File, HTTPException, Form
+from fastapi import FastAPI, UploadFile, File, HTTPException, Form, Query, Response, BackgroundTasks
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse, StreamingResponse
-from supabase import create_client, Client
+from fastapi.middleware.gzip import GZipMiddleware
+from starlette.middleware.gzip import DEFAULT_EXCLUDED_CONTENT_TYPES
+from fastapi.responses import JSONResponse, FileResponse
+from supabase import create_client, Client, ClientOptions
 from pydantic import BaseModel
-from typing import Optional, List
-from PIL import Image
-import os, io, uuid, traceback
+from typing import Optional, List, BinaryIO
+from PIL import Image, features
+import os, io, re, secrets, traceback, threading, asyncio, zipfile, tempfile
+import httpx, anyio, orjson
+from functools import lru_cache
+from contextlib import asynccontextmanager
+from concurrent.futures import ThreadPoolExecutor
+from cachetools import TTLCache
 from datetime import datetime
+from uuid import UUID
+from xml.sax.saxutils import escape
 from dotenv import load_dotenv
 
 # === THÊM IMPORT CHO EXCEL & PDF ===
-import openpyxl
-from openpyxl.styles import PatternFill, Font, Alignment
-from openpyxl.utils import get_column_letter
+import xlsxwriter
 from reportlab.lib.pagesizes import A4
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
+from reportlab.platypus import SimpleDocTemplate, LongTable, TableStyle, Paragraph, Spacer
 from reportlab.lib import colors
 from reportlab.lib.styles import getSampleStyleSheet
 
 load_dotenv()
 
-app = FastAPI(title="Flower Shop API")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Endpoint `def` chạy trong threadpool của AnyIO (mặc định 40 thread); nâng lên để các call Supabase chặn không xếp hàng
+    anyio.to_thread.current_default_thread_limiter().total_tokens = 64
+    yield
+
+class ORJSONResponse(JSONResponse):
+    # Encode JSON bằng orjson (nhanh hơn json stdlib với list dict lớn như /flowers)
+    def render(self, content) -> bytes: return orjson.dumps(content)
+
+app = FastAPI(title="Flower Shop API", lifespan=lifespan, default_response_class=ORJSONResponse)
 app.add_middleware(CORSMiddleware, allow_origins=["*"], allow_credentials=True, allow_methods=["*"], allow_headers=["*"])
+# Nén JSON (list hoa); file export xlsx/pdf vốn đã nén (deflate) nên bỏ qua, nén lại chỉ tốn CPU
+app.add_middleware(GZipMiddleware, minimum_size=1024, exclude_content_types=DEFAULT_EXCLUDED_CONTENT_TYPES + (
+    "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet", "application/pdf"))
 
 # Supabase
 SUPABASE_URL = os.getenv("SUPABASE_URL")
 SUPABASE_KEY = os.getenv("SUPABASE_KEY")
 SUPABASE_BUCKET = os.getenv("SUPABASE_BUCKET", "flower-images")
 
+# Chỉ lấy các cột thực sự dùng, tránh select("*")
+FLOWER_LIST_COLUMNS = "id,name,price,type,unit,image_url,stock,tags,created_at"
+FLOWER_EXPORT_COLUMNS = "name,price,type,unit,stock,tags"
+
+@lru_cache(maxsize=1)
+def get_supabase() -> Client:
+    # Một client / worker: postgrest + storage dùng chung pool HTTP/2 keep-alive, khỏi bắt tay TLS mỗi request.
+    # Khi truyền httpx_client, supabase bỏ qua *_client_timeout nên timeout đặt trên chính client này:
+    # 10s cho kết nối/đọc (query PostgREST), 30s cho ghi body (upload ảnh lên storage).
+    http_client = httpx.Client(http2=True, follow_redirects=True, timeout=httpx.Timeout(10, write=30),
+                               limits=httpx.Limits(max_keepalive_connections=32, max_connections=64))
+    options = ClientOptions(httpx_client=http_client)
+    return create_client(SUPABASE_URL, SUPABASE_KEY, options=options)
+
 try:
-    supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
+    supabase: Client = get_supabase()
     print(f"Connected to Supabase: {SUPABASE_URL}")
 except Exception as e:
     print(f"Supabase connection failed: {e}")
     supabase = None
 
+# Pillow-SIMD có version dạng "x.y.z.postN"; log ra để chắc bản SIMD + libjpeg-turbo đã được load
+print(f"Pillow core: {Image.core.PILLOW_VERSION}, libjpeg-turbo: {features.version('libjpeg_turbo')}")
+
+# Cache in-process cho dữ liệu ít thay đổi (loại hoa, quy cách, thống kê)
+_types_cache = TTLCache(maxsize=8, ttl=300)
+_stats_cache = TTLCache(maxsize=8, ttl=30)
+_cache_lock = threading.Lock()  # TTLCache không thread-safe, endpoint sync chạy trong threadpool
+
+def cached(cache: TTLCache, key: str, load):
+    with _cache_lock:
+        value = cache.get(key)
+    if value is None:
+        value = load()
+        with _cache_lock: cache[key] = value
+    return value
+
+def invalidate_caches():
+    with _cache_lock:
+        _types_cache.clear(); _stats_cache.clear()
+
 # Models
 class Flower(BaseModel):
     name: str; price: int; type: str; unit: str; image_url: Optional[str] = None; stock: Optional[int] = 0; tags: Optional[str] = ""
@@ -52,29 +106,35 @@ class FlowerType(BaseModel): name: str; color: str = "#f5f5f5"
 class UnitType(BaseModel): name: str
 
 # Helper
-def resize_image(image_data: bytes, max_size: tuple = (1200, 1200)) -> bytes:
+def resize_image(image_file: BinaryIO, max_size: tuple = (1200, 1200)) -> bytes:
     try:
-        img = Image.open(io.BytesIO(image_data))
-        if img.mode in ('RGBA', 'LA', 'P'):
+        img = Image.open(image_file)
+        # JPEG: cho libjpeg decode thẳng ở 1/2, 1/4, 1/8 kích thước (vẫn >= max_size) thay vì decode full rồi thu nhỏ
+        if img.format == "JPEG": img.draft("RGB", max_size)
+        if img.mode == 'P': img = img.convert('RGBA' if 'transparency' in img.info else 'RGB')
+        img.thumbnail(max_size, Image.Resampling.LANCZOS)
+        # Ghép nền trắng sau thumbnail (trên ảnh đã nhỏ); RGB/L (đa số là JPEG) đi thẳng
+        if 'A' in img.getbands():
             background = Image.new('RGB', img.size, (255, 255, 255))
-            if img.mode == 'P': img = img.convert('RGBA')
-            background.paste(img, mask=img.split()[-1] if img.mode == 'RGBA' else None)
+            background.paste(img, mask=img.getchannel('A'))
             img = background
-        img.thumbnail(max_size, Image.Resampling.LANCZOS)
+        elif img.mode not in ('RGB', 'L'): img = img.convert('RGB')
         output = io.BytesIO()
-        img.save(output, format='JPEG', quality=95)
+        img.save(output, format='JPEG', quality=85, optimize=False, progressive=False, subsampling='4:2:0')
         return output.getvalue()
     except Exception as e:
         print(f"Image resize error: {e}")
         raise
 
-def upload_image_to_supabase(file: UploadFile, flower_name: str) -> str:
+async def upload_image_to_supabase(file: UploadFile) -> str:
     try:
         if not supabase: raise Exception("Supabase not connected")
-        image_data = file.file.read()
-        resized_data = resize_image(image_data)
-        filename = f"flower_{uuid.uuid4().hex}.jpg"
-        supabase.storage.from_(SUPABASE_BUCKET).upload(filename, resized_data, file_options={"content-type": "image/jpeg", "upsert": "true"})
+        # Pillow đọc thẳng từ file tạm của UploadFile; resize (CPU) và upload (IO chặn) chạy trong threadpool
+        await file.seek(0)
+        resized_data = await asyncio.to_thread(resize_image, file.file)
+        filename = f"flower_{secrets.token_hex(12)}.jpg"
+        await asyncio.to_thread(supabase.storage.from_(SUPABASE_BUCKET).upload, filename, resized_data,
+                                file_options={"content-type": "image/jpeg", "upsert": "true"})
         url = supabase.storage.from_(SUPABASE_BUCKET).get_public_url(filename)
         url = str(url).strip()
         print(f"Image URL: {url}")
@@ -84,30 +144,52 @@ def upload_image_to_supabase(file: UploadFile, flower_name: str) -> str:
         traceback.print_exc()
         return None
 
+def remove_image_from_supabase(filename: str):
+    try: supabase.storage.from_(SUPABASE_BUCKET).remove([filename])
+    except Exception as e: print(f"Image remove error: {e}")
+
 # === ENDPOINTS ===
 @app.get("/") 
 def root(): return {"message": "Flower Shop API", "version": "1.0", "supabase_connected": supabase is not None}
 
 @app.get("/flowers")
-def get_flowers(search: Optional[str] = None, type: Optional[str] = None, tags: Optional[str] = None, low_stock: bool = False, skip: int = 0, limit: int = 100):
+def get_flowers(search: Optional[str] = None, type: Optional[str] = None, tags: Optional[str] = None, low_stock: bool = False,
+                limit: int = Query(100, ge=1, le=1000),  # <= max rows PostgREST, nếu không trang luôn thiếu và không có next_cursor
+                after_created_at: Optional[datetime] = None, after_id: Optional[UUID] = None, with_total: bool = False):
     try:
         if not supabase: raise HTTPException(500, "DB not connected")
-        query = supabase.table("flowers").select("*")
-        if search: query = query.ilike("name", f"%{search}%")
-        if type and type != "Tất cả": query = query.eq("type", type)
-        if tags: query = query.ilike("tags", f"%{tags}%")
-        if low_stock: query = query.lte("stock", 10)
-        result = query.order("created_at", desc=True).range(skip, skip + limit - 1).execute()
-        return {"flowers": result.data, "count": len(result.data)}
+        def filtered(query):
+            # ilike name/tags và lọc tồn kho thấp dùng index trigram / partial (xem supabase-schema.sql)
+            if search: query = query.ilike("name", f"%{search}%")
+            if type and type != "Tất cả": query = query.eq("type", type)
+            if tags: query = query.ilike("tags", f"%{tags}%")
+            if low_stock: query = query.lte("stock", 10)
+            return query
+        # Keyset pagination trên (created_at, id): truyền lại next_cursor của trang trước thay cho offset
+        # Cursor đã được FastAPI parse thành datetime/UUID (sai định dạng -> 422), format lại nên không chèn được filter
+        has_cursor = after_created_at is not None and after_id is not None
+        query = filtered(supabase.table("flowers").select(FLOWER_LIST_COLUMNS, count="exact" if with_total and not has_cursor else None))
+        if has_cursor:
+            ts, fid = after_created_at.isoformat(), str(after_id)
+            query = query.or_(f'created_at.lt."{ts}",and(created_at.eq."{ts}",id.lt."{fid}")')
+        result = query.order("created_at", desc=True).order("id", desc=True).limit(limit).execute()
+        flowers = result.data
+        next_cursor = {"after_created_at": flowers[-1]["created_at"], "after_id": flowers[-1]["id"]} if flowers and len(flowers) == limit else None
+        response = {"flowers": flowers, "count": len(flowers), "next_cursor": next_cursor}
+        if with_total:
+            # total = tổng theo bộ lọc, không tính điều kiện cursor; từ trang 2 trở đi đếm bằng 1 query HEAD riêng
+            response["total"] = filtered(supabase.table("flowers").select("id", count="exact", head=True)).execute().count if has_cursor else result.count
+        return response
     except Exception as e: raise HTTPException(500, str(e))
 
 @app.post("/flowers")
 async def create_flower(name: str = Form(...), price: int = Form(...), type: str = Form(...), unit: str = Form(...), stock: int = Form(0), tags: str = Form(""), image: Optional[UploadFile] = File(None)):
     try:
         if not supabase: raise HTTPException(500, "DB not connected")
-        image_url = upload_image_to_supabase(image, name) if image and image.filename else None
+        image_url = await upload_image_to_supabase(image) if image and image.filename else None
         data = {"name": name, "price": price, "type": type, "unit": unit, "stock": stock, "tags": tags, "image_url": image_url}
-        result = supabase.table("flowers").insert(data).execute()
+        result = await asyncio.to_thread(supabase.table("flowers").insert(data).execute)
+        invalidate_caches()
         return {"message": "Flower created", "flower": result.data[0]}
     except Exception as e: raise HTTPException(500, str(e))
 
@@ -123,88 +205,182 @@ async def update_flower(flower_id: str, name: Optional[str] = Form(None), price:
         if stock is not None: data["stock"] = stock
         if tags is not None: data["tags"] = tags
         if image and image.filename:
-            image_url = upload_image_to_supabase(image, name or "flower")
+            image_url = await upload_image_to_supabase(image)
             if image_url: data["image_url"] = image_url
         if not data: raise HTTPException(400, "No data to update")
-        result = supabase.table("flowers").update(data).eq("id", flower_id).execute()
+        result = await asyncio.to_thread(supabase.table("flowers").update(data).eq("id", flower_id).execute)
         if not result.data: raise HTTPException(404, "Flower not found")
+        invalidate_caches()
         return {"message": "Updated", "flower": result.data[0]}
     except HTTPException: raise
     except Exception as e: raise HTTPException(500, str(e))
 
 @app.delete("/flowers/{flower_id}")
-def delete_flower(flower_id: str):
+def delete_flower(flower_id: str, background_tasks: BackgroundTasks):
     try:
         if not supabase: raise HTTPException(500, "DB not connected")
-        flower = supabase.table("flowers").select("image_url").eq("id", flower_id).execute()
-        if flower.data and flower.data[0].get("image_url"):
-            filename = flower.data[0]["image_url"].split("/")[-1]
-            try: supabase.storage.from_(SUPABASE_BUCKET).remove([filename])
-            except: pass
-        supabase.table("flowers").delete().eq("id", flower_id).execute()
+        # 1 roundtrip: DELETE ... RETURNING image_url (xem delete_flower() trong supabase-schema.sql)
+        image_url = supabase.rpc("delete_flower", {"fid": flower_id}).execute().data
+        invalidate_caches()
+        if image_url: background_tasks.add_task(remove_image_from_supabase, image_url.split("/")[-1])
         return {"message": "Deleted"}
     except Exception as e: raise HTTPException(500, str(e))
 
 @app.get("/flower-types") 
-def get_flower_types(): 
-    result = supabase.table("flower_types").select("*").execute(); return {"types": result.data}
+def get_flower_types(response: Response): 
+    response.headers["Cache-Control"] = "public, max-age=300"
+    return {"types": cached(_types_cache, "types", lambda: supabase.table("flower_types").select("*").execute().data)}
 
 @app.get("/unit-types") 
-def get_unit_types(): 
-    result = supabase.table("unit_types").select("*").execute(); return {"units": result.data}
+def get_unit_types(response: Response): 
+    response.headers["Cache-Control"] = "public, max-age=300"
+    return {"units": cached(_types_cache, "units", lambda: supabase.table("unit_types").select("*").execute().data)}
+
+def load_stats():
+    return supabase.rpc("flower_stats").execute().data[0]
 
 @app.get("/stats")
-def get_stats():
-    flowers = supabase.table("flowers").select("*").execute().data
-    types = supabase.table("flower_types").select("*").execute().data
-    total_value = sum(f["price"] for f in flowers)
-    low_stock_count = sum(1 for f in flowers if f.get("stock", 0) <= 10)
-    return {"total_flowers": len(flowers), "total_types": len(types), "total_value": total_value, "low_stock_count": low_stock_count}
+def get_stats(response: Response):
+    # no-cache: admin gọi lại /stats ngay sau khi sửa/xoá, cache trình duyệt sẽ làm số liệu cũ; cache 30s chỉ ở server
+    response.headers["Cache-Control"] = "no-cache"
+    return cached(_stats_cache, "stats", load_stats)
 
 # === EXCEL & PDF EXPORT ===
+# Style PDF dựng 1 lần lúc import, dùng lại cho mọi request
+PDF_STYLES = getSampleStyleSheet()
+PDF_TABLE_STYLE = TableStyle([('BACKGROUND', (0,0), (-1,0), colors.HexColor("#2e7d32")), ('TEXTCOLOR', (0,0), (-1,0), colors.white),
+    ('ALIGN', (0,0), (-1,-1), 'CENTER'), ('GRID', (0,0), (-1,-1), 0.5, colors.grey), ('FONTSIZE', (0,1), (-1,-1), 8)])
+PDF_COL_WIDTHS = [30, 140, 70, 70, 60, 40, 80]
+PRICE_SEPARATOR = str.maketrans(",", ".")  # 1,200,000 -> 1.200.000
+XLSX_MEDIA_TYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+EXCEL_HEADERS = ["STT", "Tên hoa", "Giá (VNĐ)", "Loại", "Quy cách", "Tồn kho", "Tags"]
+EXCEL_COL_WIDTHS = [8, 35, 15, 15, 12, 10, 25]
+EXPORT_PAGE_SIZE = 1000  # = max rows mặc định của PostgREST trên Supabase
+
+def iter_export_flowers(type: Optional[str] = None):
+    # Đọc theo trang thay vì 1 select không giới hạn; trang kế được fetch nền trong lúc trang hiện tại đang được ghi
+    def fetch(offset):
+        query = supabase.table("flowers").select(FLOWER_EXPORT_COLUMNS)
+        if type and type != "Tất cả": query = query.eq("type", type)
+        return query.order("created_at", desc=True).order("id", desc=True).range(offset, offset + EXPORT_PAGE_SIZE - 1).execute().data
+    # Dừng ở trang rỗng chứ không ở trang ngắn: max rows của project có thể < EXPORT_PAGE_SIZE,
+    # nên offset cũng tiến theo số dòng thực nhận được
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        offset, pending = 0, pool.submit(fetch, 0)
+        while page := pending.result():
+            offset += len(page)
+            pending = pool.submit(fetch, offset)
+            yield from page
+
+class TempFileResponse(FileResponse):
+    # Xoá file tạm trong finally: background của FileResponse bị bỏ qua khi Range lỗi (400/416) hoặc client ngắt giữa chừng
+    async def __call__(self, scope, receive, send):
+        try: await super().__call__(scope, receive, send)
+        finally:
+            try: os.unlink(self.path)
+            except FileNotFoundError: pass
+
+def export_file_response(write, suffix: str, media_type: str) -> FileResponse:
+    # Ghi file export ra tempfile trên đĩa thay vì giữ cả file trong RAM; Starlette đọc file theo chunk khi gửi
+    tmp = tempfile.NamedTemporaryFile(suffix=suffix, delete=False); tmp.close()
+    try: write(tmp.name)
+    except BaseException: os.unlink(tmp.name); raise
+    filename = f"Catalog_Hoa_{datetime.now():%Y%m%d_%H%M%S}{suffix}"
+    return TempFileResponse(tmp.name, media_type=media_type, filename=filename)
+
 @app.get("/export/excel")
 def export_excel(type: Optional[str] = None):
     try:
-        query = supabase.table("flowers").select("*")
-        if type and type != "Tất cả": query = query.eq("type", type)
-        flowers = query.execute().data
-        wb = openpyxl.Workbook(); ws = wb.active; ws.title = "Catalog Hoa"
-        headers = ["STT", "Tên hoa", "Giá (VNĐ)", "Loại", "Quy cách", "Tồn kho", "Tags"]
-        header_fill = PatternFill(start_color="2e7d32", end_color="2e7d32", fill_type="solid")
-        header_font = Font(bold=True, color="FFFFFF")
-        for col, h in enumerate(headers, 1):
-            cell = ws.cell(1, col, h); cell.fill = header_fill; cell.font = header_font; cell.alignment = Alignment(horizontal="center")
-        for idx, f in enumerate(flowers, 2):
-            ws.cell(idx, 1, idx-1); ws.cell(idx, 2, f["name"]); ws.cell(idx, 3, f["price"])
-            ws.cell(idx, 4, f["type"]); ws.cell(idx, 5, f["unit"]); ws.cell(idx, 6, f.get("stock", 0)); ws.cell(idx, 7, f.get("tags", ""))
-        widths = [8, 35, 15, 15, 12, 10, 25]
-        for i, w in enumerate(widths, 1): ws.column_dimensions[get_column_letter(i)].width = w
-        output = io.BytesIO(); wb.save(output); output.seek(0)
-        filename = f"Catalog_Hoa_{datetime.now():%Y%m%d_%H%M%S}.xlsx"
-        return StreamingResponse(output, media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-                                 headers={"Content-Disposition": f"attachment; filename*=UTF-8''{filename}"})
+        def write(path):
+            # Không dùng in_memory: option đó vô hiệu hoá constant_memory
+            wb = xlsxwriter.Workbook(path, {"constant_memory": True}); ws = wb.add_worksheet("Catalog Hoa")
+            for i, w in enumerate(EXCEL_COL_WIDTHS): ws.set_column(i, i, w)
+            header_fmt = wb.add_format({"bold": True, "font_color": "white", "bg_color": "#2e7d32", "align": "center"})
+            ws.write_row(0, 0, EXCEL_HEADERS, header_fmt)
+            for idx, f in enumerate(iter_export_flowers(type), 1):
+                ws.write_row(idx, 0, (idx, f["name"], f["price"], f["type"], f["unit"], f.get("stock", 0), f.get("tags", "")))
+            wb.close()
+        return export_file_response(write, ".xlsx", XLSX_MEDIA_TYPE)
+    except Exception as e: raise HTTPException(500, str(e))
+
+# XLSX tự ghi: các part cố định của OOXML + sheet1.xml stream từng dòng (inlineStr, không cần sharedStrings)
+XML_HEAD = '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+XLSX_NS = "http://schemas.openxmlformats.org/spreadsheetml/2006/main"
+XLSX_PARTS = {
+    "[Content_Types].xml": XML_HEAD + '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/><Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '<Override PartName="/xl/styles.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/></Types>',
+    "_rels/.rels": XML_HEAD + '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" Target="xl/workbook.xml"/></Relationships>',
+    "xl/workbook.xml": XML_HEAD + f'<workbook xmlns="{XLSX_NS}" xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+        '<sheets><sheet name="Catalog Hoa" sheetId="1" r:id="rId1"/></sheets></workbook>',
+    "xl/_rels/workbook.xml.rels": XML_HEAD + '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" Target="worksheets/sheet1.xml"/>'
+        '<Relationship Id="rId2" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/styles" Target="styles.xml"/></Relationships>',
+    # Style 1 = header: chữ đậm trắng, nền xanh #2e7d32, căn giữa
+    "xl/styles.xml": XML_HEAD + f'<styleSheet xmlns="{XLSX_NS}">'
+        '<fonts count="2"><font><sz val="11"/><name val="Calibri"/></font><font><b/><sz val="11"/><color rgb="FFFFFFFF"/><name val="Calibri"/></font></fonts>'
+        '<fills count="3"><fill><patternFill patternType="none"/></fill><fill><patternFill patternType="gray125"/></fill>'
+        '<fill><patternFill patternType="solid"><fgColor rgb="FF2E7D32"/><bgColor indexed="64"/></patternFill></fill></fills>'
+        '<borders count="1"><border><left/><right/><top/><bottom/><diagonal/></border></borders>'
+        '<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>'
+        '<cellXfs count="2"><xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/>'
+        '<xf numFmtId="0" fontId="1" fillId="2" borderId="0" xfId="0" applyFont="1" applyFill="1" applyAlignment="1"><alignment horizontal="center"/></xf></cellXfs>'
+        '<cellStyles count="1"><cellStyle name="Normal" xfId="0" builtinId="0"/></cellStyles></styleSheet>',
+}
+XLSX_COLS = "ABCDEFG"
+# Giống XlsxWriter: ký tự điều khiển (cấm trong XML 1.0) ghi dạng _xHHHH_, chuỗi "_xHHHH_" có sẵn thì escape thành _x005F_xHHHH_
+XLSX_ESCAPED_RE = re.compile(r"(_x[0-9a-fA-F]{4}_)")
+XLSX_CONTROL_RE = re.compile(r"[\x00-\x08\x0b-\x1f]")
+
+def xlsx_cell(ref: str, value, style: str = "") -> str:
+    if value is None or value == "": return ""
+    if isinstance(value, int): return f'<c r="{ref}"{style}><v>{value}</v></c>'
+    text = str(value)
+    # Excel tự cắt khoảng trắng đầu/cuối nếu thiếu xml:space="preserve"
+    space = ' xml:space="preserve"' if text[:1].isspace() or text[-1:].isspace() else ""
+    text = XLSX_CONTROL_RE.sub(lambda m: f"_x{ord(m.group()):04X}_", XLSX_ESCAPED_RE.sub(r"_x005F\1", text))
+    return f'<c r="{ref}"{style} t="inlineStr"><is><t{space}>{escape(text)}</t></is></c>'
+
+def iter_sheet_xml(type: Optional[str] = None):
+    cols = "".join(f'<col min="{i}" max="{i}" width="{w}" customWidth="1"/>' for i, w in enumerate(EXCEL_COL_WIDTHS, 1))
+    header = "".join(xlsx_cell(f"{c}1", h, ' s="1"') for c, h in zip(XLSX_COLS, EXCEL_HEADERS))
+    yield XML_HEAD + f'<worksheet xmlns="{XLSX_NS}"><cols>{cols}</cols><sheetData><row r="1">{header}</row>'
+    for idx, f in enumerate(iter_export_flowers(type), 1):
+        r = idx + 1
+        yield (f'<row r="{r}"><c r="A{r}"><v>{idx}</v></c>{xlsx_cell(f"B{r}", f["name"])}{xlsx_cell(f"C{r}", f["price"])}'
+               f'{xlsx_cell(f"D{r}", f["type"])}{xlsx_cell(f"E{r}", f["unit"])}{xlsx_cell(f"F{r}", f.get("stock", 0))}{xlsx_cell(f"G{r}", f.get("tags", ""))}</row>')
+    yield "</sheetData></worksheet>"
+
+@app.get("/export/excel-fast")
+def export_excel_fast(type: Optional[str] = None):
+    try:
+        def write(path):
+            with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as zf:
+                for name, xml in XLSX_PARTS.items(): zf.writestr(name, xml)
+                with zf.open("xl/worksheets/sheet1.xml", "w") as sheet:
+                    for chunk in iter_sheet_xml(type): sheet.write(chunk.encode("utf-8"))
+        return export_file_response(write, ".xlsx", XLSX_MEDIA_TYPE)
     except Exception as e: raise HTTPException(500, str(e))
 
 @app.get("/export/pdf")
 def export_pdf(type: Optional[str] = None):
     try:
-        query = supabase.table("flowers").select("*")
-        if type and type != "Tất cả": query = query.eq("type", type)
-        flowers = query.execute().data
-        output = io.BytesIO(); doc = SimpleDocTemplate(output, pagesize=A4, topMargin=30)
-        elements = []; styles = getSampleStyleSheet()
-        elements.append(Paragraph("CATALOG HOA ĐẸP", styles['Heading1'])); elements.append(Spacer(1, 12))
-        elements.append(Paragraph(f"Ngày xuất: {datetime.now():%d/%m/%Y %H:%M}", styles['Normal'])); elements.append(Spacer(1, 12))
-        data = [["STT", "Tên hoa", "Giá", "Loại", "Quy cách", "Tồn", "Tags"]]
-        for i, f in enumerate(flowers, 1):
-            data.append([str(i), f["name"], f"{f['price']:,}".replace(",", "."), f["type"], f["unit"], str(f.get("stock", 0)), (f.get("tags", "") or "")[:30]])
-        table = Table(data, colWidths=[30, 140, 70, 70, 60, 40, 80])
-        table.setStyle(TableStyle([('BACKGROUND', (0,0), (-1,0), colors.HexColor("#2e7d32")), ('TEXTCOLOR', (0,0), (-1,0), colors.white),
-            ('ALIGN', (0,0), (-1,-1), 'CENTER'), ('GRID', (0,0), (-1,-1), 0.5, colors.grey), ('FONTSIZE', (0,1), (-1,-1), 8)]))
-        elements.append(table); elements.append(Spacer(1, 12)); elements.append(Paragraph(f"<b>Tổng: {len(flowers)} sản phẩm</b>", styles['Normal']))
-        doc.build(elements); output.seek(0)
-        filename = f"Catalog_Hoa_{datetime.now():%Y%m%d_%H%M%S}.pdf"
-        return StreamingResponse(output, media_type="application/pdf", headers={"Content-Disposition": f"attachment; filename*=UTF-8''{filename}"})
+        def write(path):
+            doc = SimpleDocTemplate(path, pagesize=A4, topMargin=30)
+            elements = []
+            elements.append(Paragraph("CATALOG HOA ĐẸP", PDF_STYLES['Heading1'])); elements.append(Spacer(1, 12))
+            elements.append(Paragraph(f"Ngày xuất: {datetime.now():%d/%m/%Y %H:%M}", PDF_STYLES['Normal'])); elements.append(Spacer(1, 12))
+            data = [["STT", "Tên hoa", "Giá", "Loại", "Quy cách", "Tồn", "Tags"]]
+            for i, f in enumerate(iter_export_flowers(type), 1):
+                data.append([str(i), f["name"], format(f['price'], ',d').translate(PRICE_SEPARATOR), f["type"], f["unit"], str(f.get("stock", 0)), (f.get("tags", "") or "")[:30]])
+            table = LongTable(data, colWidths=PDF_COL_WIDTHS, repeatRows=1)
+            table.setStyle(PDF_TABLE_STYLE)
+            elements.append(table); elements.append(Spacer(1, 12)); elements.append(Paragraph(f"<b>Tổng: {len(data) - 1} sản phẩm</b>", PDF_STYLES['Normal']))
+            doc.build(elements)
+        return export_file_response(write, ".pdf", "application/pdf")
     except Exception as e: raise HTTPException(500, str(e))
 
 if __name__ == "__main__":
@@ -57,6 +57,8 @@ CREATE TABLE flowers (
     type TEXT NOT NULL DEFAULT 'Khác',
     unit TEXT NOT NULL DEFAULT '1 bó',
     image_url TEXT,
+    stock INTEGER DEFAULT 0,
+    tags TEXT DEFAULT '',
     created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
     updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
 );
@@ -64,7 +66,17 @@ CREATE TABLE flowers (
 -- Create indexes for better search performance
 CREATE INDEX idx_flowers_name ON flowers(name);
 CREATE INDEX idx_flowers_type ON flowers(type);
-CREATE INDEX idx_flowers_created_at ON flowers(created_at DESC);
+-- Keyset pagination of GET /flowers (ORDER BY created_at DESC, id DESC)
+CREATE INDEX idx_flowers_created_id ON flowers(created_at DESC, id DESC);
+CREATE INDEX idx_flowers_type_created ON flowers(type, created_at DESC, id DESC);
+
+-- Trigram indexes so ILIKE '%term%' on name/tags can use an index instead of a seq scan
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+CREATE INDEX idx_flowers_name_trgm ON flowers USING GIN (name gin_trgm_ops);
+CREATE INDEX idx_flowers_tags_trgm ON flowers USING GIN (tags gin_trgm_ops);
+
+-- Partial index for the low-stock filter (stock <= 10)
+CREATE INDEX idx_flowers_low_stock ON flowers(stock) WHERE stock <= 10;
 
 -- =====================================================
 -- ROW LEVEL SECURITY (RLS) - Optional
@@ -159,6 +171,22 @@ BEGIN
 END;
 $$ LANGUAGE plpgsql;
 
+-- Dashboard stats (/stats) computed in one query instead of pulling every row
+CREATE OR REPLACE FUNCTION flower_stats()
+RETURNS TABLE(total_flowers BIGINT, total_types BIGINT, total_value BIGINT, low_stock_count BIGINT) AS $$
+    SELECT
+        (SELECT COUNT(*) FROM flowers),
+        (SELECT COUNT(*) FROM flower_types),
+        (SELECT COALESCE(SUM(price), 0)::BIGINT FROM flowers),
+        (SELECT COUNT(*) FROM flowers WHERE COALESCE(stock, 0) <= 10);
+$$ LANGUAGE sql STABLE;
+
+-- Delete a flower and return its image_url in one roundtrip (NULL if not found / no image)
+CREATE OR REPLACE FUNCTION delete_flower(fid UUID)
+RETURNS TEXT AS $$
+    DELETE FROM flowers WHERE id = fid RETURNING image_url;
+$$ LANGUAGE sql;
+
 -- Search flowers (full-text search)
 CREATE OR REPLACE FUNCTION search_flowers(search_term TEXT)
 RETURNS SETOF flowers AS $$